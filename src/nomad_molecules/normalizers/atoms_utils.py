@@ -1,17 +1,60 @@
+from __future__ import annotations
+
+import hashlib
 import os
+import sqlite3
+from pathlib import Path
 
 import numpy as np
 
 from ase import Atoms
 from matid.geometry import get_dimensionality
-from molid.search.db_lookup import basic_offline_search
 from molid.utils.conversion import atoms_to_inchikey
 
 # threshold below which we treat a cell as singular
 SINGULAR_CELL_DET_THRESHOLD = 1e-8
+# maximum number of entries kept in each per-process cache
+CACHE_SIZE = 10000
+
+# decimals (in Angstrom) kept when comparing structures for duplicates
+SIGNATURE_DECIMALS = 3
+
+# table of the offline PubChem database that molid looks up
+COMPOUND_TABLE = 'compound_data'
+# lookup by full InChIKey and by its first block (skeleton) in one statement;
+# both are exact matches on indexed columns, formatted with the placeholders
+# of the InChIKeys and of the skeletons. Rows come in rowid order, so the
+# first row of a skeleton is the one a skeleton-only lookup returns.
+MATCH_QUERY = (
+    f"SELECT * FROM {COMPOUND_TABLE} WHERE InChIKey IN ({{}}) OR InChIKey14 IN ({{}}) "
+    "ORDER BY rowid"
+)
+# maximum number of keys per IN list, well below SQLite's variable limit
+LOOKUP_CHUNK_SIZE = 500
+# columns the lookups search, which need an index to avoid table scans
+LOOKUP_COLUMNS = ('InChIKey', 'InChIKey14')
+# columns that lead an index (including UNIQUE autoindexes) of a table
+INDEXED_COLUMNS_QUERY = (
+    "SELECT info.name FROM pragma_index_list(?) AS list, "
+    "pragma_index_info(list.name) AS info WHERE info.seqno = 0"
+)
+
+# InChIKeys of already converted structures, keyed by atoms_signature()
+_inchikey_cache: dict = {}
+# MatID dimensionalities of already validated structures
+_dimensionality_cache: dict = {}
+# database files whose lookup indexes were already checked in this process
+_indexed_databases: set = set()
+# read-only connections shared by all lookups, keyed by database file; each
+# entry is (database_stamp() of the file, connection)
+_connections: dict = {}
+# lookup results of already queried InChIKeys (an empty list for no match),
+# keyed by database file; each entry is (database_stamp() of the file,
+# dict mapping InChIKey to the results)
+_database_results: dict = {}
 
 
-def get_atoms_data(topology, atoms_ref, logger):
+def get_atoms_data(topology, atoms_ref, logger, ase_cache: dict | None = None):
     """
     Retrieves atom data from a topology object.
 
@@ -19,6 +62,8 @@ def get_atoms_data(topology, atoms_ref, logger):
         topology: The topology object containing atom information.
         atoms_ref: Reference to ASE atoms or indices.
         logger: Logger for logging messages.
+        ase_cache: Optional dict to reuse the ASE conversion of atoms_ref
+            across topologies that select indices from the same atoms.
 
     Returns:
         The ASE Atoms object if available; otherwise, None.
@@ -29,7 +74,14 @@ def get_atoms_data(topology, atoms_ref, logger):
         try:
             # indices may be a nested list
             idx = topology.indices[0]
-            return atoms_ref.to_ase()[idx]
+            if ase_cache is None:
+                return atoms_ref.to_ase()[idx]
+            # Indexing returns a copy, so the cached Atoms are never modified
+            full_atoms = ase_cache.get(id(atoms_ref))
+            if full_atoms is None:
+                full_atoms = atoms_ref.to_ase()
+                ase_cache[id(atoms_ref)] = full_atoms
+            return full_atoms[idx]
         except Exception as e:
             logger.error(f"Failed to apply topology indices: {e}")
             return None
@@ -43,36 +95,75 @@ def get_atoms_data(topology, atoms_ref, logger):
         return None
 
 
+def get_atom_count(topology, atoms_ref) -> int | None:
+    """
+    Returns the number of atoms that get_atoms_data() would return, read from
+    the topology without converting it to ASE Atoms.
+
+    Returns None if the count cannot be determined cheaply.
+    """
+    if getattr(topology, 'indices', None) is not None:
+        try:
+            return len(topology.indices[0])
+        except Exception:
+            return None
+    elif topology.atoms is not None:
+        atoms = topology.atoms
+    elif topology.atoms_ref is not None:
+        atoms = topology.atoms_ref
+    else:
+        return None
+
+    # to_ase() builds one atom per label
+    if atoms.labels is not None:
+        return len(atoms.labels)
+    return atoms.n_atoms
+
+
+def _det3(m: np.ndarray) -> float:
+    """
+    Closed-form determinant of a 3x3 matrix, avoiding the LAPACK call.
+    """
+    return (
+        m[0, 0] * (m[1, 1] * m[2, 2] - m[1, 2] * m[2, 1])
+        - m[0, 1] * (m[1, 0] * m[2, 2] - m[1, 2] * m[2, 0])
+        + m[0, 2] * (m[1, 0] * m[2, 1] - m[1, 1] * m[2, 0])
+    )
+
+
 def wrap_atoms(atoms: Atoms) -> Atoms:
     """
     Unwraps atom positions using the minimum image convention.
+    The positions are modified in place; constraints are not applied.
     """
-    positions = atoms.get_positions(copy=True)
-    cell = atoms.get_cell()
+    cell = atoms.cell.array
     # Skip unwrapping if the cell is singular
-    if abs(np.linalg.det(cell)) < SINGULAR_CELL_DET_THRESHOLD:
+    if abs(_det3(cell)) < SINGULAR_CELL_DET_THRESHOLD:
         return atoms
 
-    ref = positions[0]
-    for i in range(1, len(positions)):
-        disp = positions[i] - ref
-        try:
-            frac_disp = np.linalg.solve(cell, disp)
-        except np.linalg.LinAlgError:
-            frac_disp = np.zeros_like(disp)
-        disp -= cell.dot(np.round(frac_disp))
-        positions[i] = ref + disp
-
-    atoms.set_positions(positions)
-    atoms.center()
+    # Invert the cell once instead of solving the same 3x3 system per atom
+    try:
+        inv_cell = np.linalg.inv(cell)
+    except np.linalg.LinAlgError:
+        return atoms
+
+    # Shift all atoms by the whole lattice vectors that bring them closest to
+    # the first one, in a single batched matmul on the positions array.
+    # No centering: the InChIKey does not depend on the translation
+    positions = atoms.positions
+    frac_disps = (positions[1:] - positions[0]) @ inv_cell.T
+    positions[1:] -= np.round(frac_disps) @ cell.T
     return atoms
 
 
-def validate_atom_count(atoms_data: Atoms, min_atoms: int, max_atoms: int, logger) -> bool:
+def validate_atom_count(
+    atoms_data: Atoms | int, min_atoms: int, max_atoms: int, logger
+) -> bool:
     """
     Checks if the number of atoms is within acceptable limits.
+    Accepts either the ASE Atoms or an already known atom count.
     """
-    num_atoms = len(atoms_data)
+    num_atoms = len(atoms_data) if isinstance(atoms_data, Atoms) else atoms_data
     if num_atoms < min_atoms:
         logger.warning(
             f"System has only {num_atoms} atoms; minimum required is {min_atoms}."
@@ -86,11 +177,36 @@ def validate_atom_count(atoms_data: Atoms, min_atoms: int, max_atoms: int, logge
     return True
 
 
+def _cache_put(cache: dict, key, value) -> None:
+    """
+    Stores the value, evicting the oldest entry once the cache is full.
+    """
+    if len(cache) >= CACHE_SIZE:
+        # dicts keep insertion order, so this is the oldest entry
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
 def validate_dimensionality(atoms: Atoms, logger) -> bool:
     """
     Validates that the system is 0D (non-periodic).
     """
-    dimensionality = get_dimensionality(atoms)
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (atoms.numbers, atoms.positions, atoms.cell.array, atoms.pbc):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    key = digest.digest()
+    if key in _dimensionality_cache:
+        dimensionality = _dimensionality_cache[key]
+    else:
+        dimensionality = get_dimensionality(atoms)
+        _cache_put(_dimensionality_cache, key, dimensionality)
+    if dimensionality is None:
+        # MatID finds no single connected cluster, e.g. for separate fragments
+        logger.warning(
+            "System is not a single connected molecule. Skipping normalization "
+            "and continue."
+        )
+        return False
     if dimensionality != 0:
         logger.warning(
             f"System is {dimensionality}D, only 0D systems are processed. Skipping normalization and continue."
@@ -99,37 +215,263 @@ def validate_dimensionality(atoms: Atoms, logger) -> bool:
     return True
 
 
-def query_molecule_database_util(atoms: Atoms, database_file: str, logger):
+def _update_digest(digest, atoms: Atoms) -> None:
     """
-    Compute an InChIKey from the ASE Atoms, then do an offline-basic lookup.
-    Returns (inchikey, results_list, full_match_flag).
+    Feeds the atomic numbers, masses and the positions relative to the first
+    atom, rounded to SIGNATURE_DECIMALS, into the digest.
     """
-    if not os.path.isfile(database_file):
-        logger.error(f"Database file '{database_file}' not found or inaccessible.")
-        return None, [], None
+    positions = atoms.positions - atoms.positions[:1]
+    digest.update(atoms.numbers.tobytes())
+    digest.update(atoms.get_masses().tobytes())
+    # adding 0.0 turns -0.0 into 0.0, so both hash the same
+    digest.update((positions.round(SIGNATURE_DECIMALS) + 0.0).tobytes())
 
-    try:
+
+def atoms_signature(atoms: Atoms) -> bytes:
+    """
+    Returns a compact hash of the atomic numbers, masses and positions, that
+    is shared by conformers differing only by a translation or by noise below
+    SIGNATURE_DECIMALS.
+
+    Masses are part of the signature because isotopes change the InChIKey.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, atoms)
+    return digest.digest()
+
+
+def structure_signature(atoms: Atoms) -> bytes:
+    """
+    Returns a hash that is shared by structures that only differ by a
+    translation, e.g. the same molecule selected from different topologies.
+
+    Extends atoms_signature() by cell and periodicity, because unwrapping
+    and the dimensionality check depend on them.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, atoms)
+    digest.update(np.ascontiguousarray(atoms.cell.array).tobytes())
+    digest.update(atoms.pbc.tobytes())
+    return digest.digest()
+
+
+def compute_inchikey(atoms: Atoms) -> str:
+    """
+    Computes the InChIKey of the ASE Atoms, reusing the result for structures
+    that were already converted in this process.
+    """
+    key = atoms_signature(atoms)
+    inchikey = _inchikey_cache.get(key)
+    if inchikey is None:
         inchikey = atoms_to_inchikey(atoms)
-        logger.info(f"Computed InChIKey: {inchikey}")
-    except Exception as e:
-        logger.error(f"Error computing InChIKey: {e}")
-        return None, [], None
+        _cache_put(_inchikey_cache, key, inchikey)
+    return inchikey
+
+
+def check_database_indexes(database_file: str, logger) -> None:
+    """
+    Warns if the InChIKey or InChIKey14 column of the offline database is not
+    indexed, since every lookup then scans the whole table.
+
+    Runs once per database file and process, over the read-only connection.
+    The indexes are not created here: molid builds them with the database,
+    and building them on a shared file would block its readers.
+    """
+    if database_file in _indexed_databases:
+        return
+    _indexed_databases.add(database_file)
+
+    conn = get_database_connection(database_file)
+    indexed = {row[0] for row in conn.execute(INDEXED_COLUMNS_QUERY, (COMPOUND_TABLE,))}
+    for column in LOOKUP_COLUMNS:
+        if column not in indexed:
+            logger.warning(
+                f"Database file '{database_file}' has no index on {column}; "
+                "lookups will scan the whole table."
+            )
+
+
+def database_stamp(database_file: str) -> tuple:
+    """
+    Returns the inode and modification time of the database file, which
+    change when the file is modified or replaced by another one.
+    """
+    stat = os.stat(database_file)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def get_database_connection(database_file: str) -> sqlite3.Connection:
+    """
+    Returns a read-only connection to the database file.
+
+    The connection is opened on first use and kept for the lifetime of the
+    process, so SQLite's page and statement caches stay warm across lookups.
+    It is reopened when the file is modified or replaced, together with the
+    result cache of get_database_results().
+    """
+    stamp = database_stamp(database_file)
+    cached = _connections.get(database_file)
+    if cached is not None and cached[0] == stamp:
+        conn = cached[1]
+    else:
+        uri = f"{Path(database_file).absolute().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=1")
+        # Read pages through the OS page cache and keep up to ~200 MB of
+        # them in SQLite's own cache
+        conn.execute("PRAGMA mmap_size=1073741824")
+        conn.execute("PRAGMA cache_size=-200000")
+        _connections[database_file] = (stamp, conn)
+    return conn
+
+
+def _padded(keys: list) -> list:
+    """
+    Pads the keys to the next power of two by repeating the last one, which
+    does not change the rows of an IN list. Only a few distinct statements are
+    then prepared, and they stay in the connection's statement cache.
+    """
+    size = min(1 << (len(keys) - 1).bit_length(), LOOKUP_CHUNK_SIZE)
+    return keys + keys[-1:] * (size - len(keys))
+
+
+def lookup_inchikeys(conn: sqlite3.Connection, inchikeys: list) -> dict:
+    """
+    Looks up several InChIKeys in the offline database with one query per
+    chunk of at most LOOKUP_CHUNK_SIZE keys. Keys without a full match fall
+    back to a skeleton match on their first block (InChIKey14).
+    Returns a dict mapping each matched InChIKey to a list with its row as dict.
+    """
+    keys = list(dict.fromkeys(inchikeys))
+    if not keys:
+        return {}
+
+    full_matches = {}
+    skeleton_matches = {}
+    # the connection may come from the caller, so its row factory is unknown
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        chunk = _padded(keys[start:start + LOOKUP_CHUNK_SIZE])
+        skeletons = _padded(list(dict.fromkeys(key[:14] for key in chunk)))
+        query = MATCH_QUERY.format(
+            ','.join('?' * len(chunk)), ','.join('?' * len(skeletons))
+        )
+        for row in cursor.execute(query, chunk + skeletons):
+            full_matches[row["InChIKey"]] = row
+            skeleton_matches.setdefault(row["InChIKey14"], row)
+
+    matches = {}
+    for key in keys:
+        row = full_matches.get(key) or skeleton_matches.get(key[:14])
+        if row is not None:
+            matches[key] = [dict(row)]
+    return matches
+
+
+def lookup_inchikey(conn: sqlite3.Connection, inchikey: str) -> list:
+    """
+    Looks up a single InChIKey, see lookup_inchikeys().
+    Returns a list with the matching row as a dict, or an empty list.
+    """
+    return lookup_inchikeys(conn, [inchikey]).get(inchikey, [])
+
+
+def get_database_results(database_file: str) -> dict:
+    """
+    Returns the cached lookup results of the database file, mapping each
+    already queried InChIKey to its results (an empty list if it had neither
+    a full nor a skeleton match).
+
+    The cache is dropped when the file is modified or replaced.
+    """
+    stamp = database_stamp(database_file)
+    cached = _database_results.get(database_file)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, {})
+        _database_results[database_file] = cached
+    return cached[1]
+
+
+def batch_query_molecule_database_util(
+    atoms_list: list, database: str | sqlite3.Connection, logger
+) -> list:
+    """
+    Compute the InChIKeys of all ASE Atoms, then look them up in the offline
+    database in a single batch.
+    The database is either a file path or an open connection; results are
+    only cached across calls for paths.
+    Returns a list of (inchikey, results_list, full_match_flag), one per Atoms.
+    """
+    failed = (None, [], None)
+    if isinstance(database, sqlite3.Connection):
+        conn = database
+        cached_results = {}
+    else:
+        if not os.path.isfile(database):
+            logger.error(f"Database file '{database}' not found or inaccessible.")
+            return [failed] * len(atoms_list)
+        conn = None
+
+    inchikeys = []
+    for atoms in atoms_list:
+        try:
+            inchikey = compute_inchikey(atoms)
+            logger.info(f"Computed InChIKey: {inchikey}")
+        except Exception as e:
+            logger.error(f"Error computing InChIKey: {e}")
+            inchikey = None
+        inchikeys.append(inchikey)
 
     try:
-        results = basic_offline_search(database_file, inchikey)
-        if not results or not results[0]:
-            logger.info(f"No match found in local DB for {inchikey}")
-            return inchikey, [], None
+        # Only InChIKeys that were not looked up before go to SQLite
+        if conn is None:
+            check_database_indexes(database, logger)
+            cached_results = get_database_results(database)
+            conn = get_database_connection(database)
+        # Read the hits before caching anything: caching may evict them
+        batch_results = {
+            inchikey: cached_results[inchikey]
+            for inchikey in inchikeys
+            if inchikey in cached_results
+        }
+        pending = [
+            inchikey
+            for inchikey in inchikeys
+            if inchikey is not None and inchikey not in batch_results
+        ]
+        if pending:
+            matches = lookup_inchikeys(conn, pending)
+            for inchikey in pending:
+                batch_results[inchikey] = matches.get(inchikey, [])
+                _cache_put(cached_results, inchikey, batch_results[inchikey])
     except Exception as e:
         logger.error(f"Error querying local DB: {e}")
-        return None, [], None
+        return [failed] * len(atoms_list)
 
-    try:
-        full_match = (results[0]["InChIKey"] == inchikey)
-        return inchikey, results, full_match
-    except Exception as e:
-        logger.error(f"Error processing DB results: {e}")
-        return None, [], None
+    query_results = []
+    for inchikey in inchikeys:
+        if inchikey is None:
+            query_results.append(failed)
+            continue
+        results = batch_results[inchikey]
+        if not results:
+            logger.info(f"No match found in local DB for {inchikey}")
+            query_results.append((inchikey, [], None))
+            continue
+        query_results.append((inchikey, results, results[0]["InChIKey"] == inchikey))
+    return query_results
+
+
+def query_molecule_database_util(
+    atoms: Atoms, database: str | sqlite3.Connection, logger
+):
+    """
+    Compute an InChIKey from the ASE Atoms, then do an offline-basic lookup.
+    Returns (inchikey, results_list, full_match_flag).
+    """
+    return batch_query_molecule_database_util([atoms], database, logger)[0]
 
 
 def generate_topology_util(system, inchikey, molecule_data, logger):
@@ -4,9 +4,11 @@ from nomad.datamodel.results import Cheminformatics
 from molid.utils.settings import save_config
 
 from .atoms_utils import (
+    batch_query_molecule_database_util,
     generate_topology_util,
+    get_atom_count,
     get_atoms_data,
-    query_molecule_database_util,
+    structure_signature,
     validate_atom_count,
     validate_dimensionality,
     wrap_atoms,
@@ -17,6 +19,8 @@ class MoleculesNormalizer(Normalizer):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # molid settings last written to ~/.molid.env by this instance
+        self._saved_molid_config = None
         # This is not how its suppose to be but for now the only solution
         # from simulationworkflowschema import load_modules
         # load_modules()
@@ -39,10 +43,15 @@ class MoleculesNormalizer(Normalizer):
         molid_mode = cfg.molid_mode
         if molid_mode == "offline-basic":
             database_file = cfg.molid_master_db
-            save_config(master_db = cfg.molid_master_db, mode = molid_mode)
+            molid_config = dict(master_db = cfg.molid_master_db, mode = molid_mode)
         else:
             database_file = cfg.molid_cache_db
-            save_config(cache_db = cfg.molid_cache_db, mode = molid_mode)
+            molid_config = dict(cache_db = cfg.molid_cache_db, mode = molid_mode)
+        # The config is re-read for every archive, but only rewrite the molid
+        # settings file when they actually changed
+        if molid_config != self._saved_molid_config:
+            save_config(**molid_config)
+            self._saved_molid_config = molid_config
         max_atoms = cfg.max_atoms
         min_atoms = cfg.min_atoms
 
@@ -67,73 +76,101 @@ class MoleculesNormalizer(Normalizer):
                 logger.info("No topology data found in archive. Exiting normalization.")
             return
 
-        # Process each topology
+        # Collect the valid molecules first, so they can be looked up at once.
+        # Topologies with the same structure are processed only once and share
+        # the result.
+        molecules = []
+        duplicates = {}
+        # ASE conversions of the atoms that topologies select indices from
+        ase_cache = {}
+        composite = len(topologies) > 1
         for topology in topologies:
-            label = getattr(topology, "label", None)
+            label = topology.label
             if label == 'conventional cell':
                 if logger:
                     logger.debug("Skipping 'conventional cell' topology.")
                 continue
-            if label == 'original' and len(topologies) > 1:
+            if label == 'original' and composite:
                 if logger:
                     logger.debug("Skipping 'original' topology in a composite system.")
                 continue
 
             # Determine atoms reference
-            atoms_ref = None
-            if getattr(topology, "atoms_ref", None):
-                atoms_ref = topology.atoms_ref
-            elif getattr(topology, "atoms", None):
-                atoms_ref = topology.atoms
-            else:
+            atoms_ref = topology.atoms_ref or topology.atoms
+            if not atoms_ref:
                 if logger:
                     logger.warning("No atoms or atoms_ref found in topology; skipping.")
                 continue
 
+            # Validate atom count before building the ASE Atoms, if it is known
+            num_atoms = get_atom_count(topology, atoms_ref)
+            if num_atoms is not None and not validate_atom_count(
+                num_atoms, min_atoms, max_atoms, logger
+            ):
+                continue
+
             # Retrieve ASE Atoms
-            ase_atoms = get_atoms_data(topology, atoms_ref, logger)
+            ase_atoms = get_atoms_data(topology, atoms_ref, logger, ase_cache)
             if ase_atoms is None:
                 continue
 
             # Validate atom count
-            if not validate_atom_count(ase_atoms, min_atoms, max_atoms, logger):
+            if num_atoms is None and not validate_atom_count(
+                ase_atoms, min_atoms, max_atoms, logger
+            ):
                 continue
 
+            signature = structure_signature(ase_atoms)
+            if signature in duplicates:
+                duplicates[signature].append(topology)
+                continue
+            duplicates[signature] = [topology]
+
             # Unwrap periodic coordinates if fully periodic
-            if all(ase_atoms.pbc):
+            if ase_atoms.pbc.all():
                 ase_atoms = wrap_atoms(ase_atoms)
 
             # Ensure a 0D (non-periodic) molecule
             if not validate_dimensionality(ase_atoms, logger):
                 continue
 
-            # Query the local PubChem offline DB
-            inchikey, molecule_data, matched_full = query_molecule_database_util(
-                ase_atoms, database_file, logger
-            )
+            molecules.append((signature, ase_atoms))
+
+        if not molecules:
+            return
+
+        # Query the local PubChem offline DB for all molecules in one batch
+        query_results = batch_query_molecule_database_util(
+            [ase_atoms for _, ase_atoms in molecules], database_file, logger
+        )
+        for (signature, _), (inchikey, molecule_data, matched_full) in zip(
+            molecules, query_results
+        ):
             if inchikey is None or matched_full is None:
                 continue
 
-            # Attach cheminformatics metadata
-            if matched_full:
-                match_type = 'full structure'
-                topology.cheminformatics = Cheminformatics(
-                    smiles=molecule_data[0]["SMILES"],
-                    inchi_key=molecule_data[0]["InChIKey"],
-                    inchi=molecule_data[0]["InChI"],
-                    match_type=match_type
+            if not matched_full and logger:
+                logger.info(
+                    "Molecule identification based on the first block of the InChIKey "
+                    "(connectivity only, first 14 characters)."
                 )
-            else:
-                if logger:
-                    logger.info(
-                        "Molecule identification based on the first block of the InChIKey "
-                        "(connectivity only, first 14 characters)."
+            for topology in duplicates[signature]:
+                # Attach cheminformatics metadata; a section has a single
+                # parent, so every topology gets its own one
+                if matched_full:
+                    match_type = 'full structure'
+                    topology.cheminformatics = Cheminformatics(
+                        smiles=molecule_data[0]["SMILES"],
+                        inchi_key=molecule_data[0]["InChIKey"],
+                        inchi=molecule_data[0]["InChI"],
+                        match_type=match_type
+                    )
+                else:
+                    match_type = 'skeleton (core)'
+                    topology.cheminformatics = Cheminformatics(
+                        inchi_key=inchikey,
+                        match_type=match_type
                     )
-                match_type = 'skeleton (core)'
-                topology.cheminformatics = Cheminformatics(
-                    inchi_key=inchikey,
-                    match_type=match_type
-                )
 
-            # Generate NOMAD-compatible topology data
-            generate_topology_util(topology, inchikey, molecule_data, logger)
+                # Generate NOMAD-compatible topology data
+                generate_topology_util(topology, inchikey, molecule_data, logger)
@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import call
 
 from nomad.datamodel.metainfo import runschema
 # This is not how its suppose to be but for now the only solution
@@ -8,4 +9,46 @@ from nomad.datamodel.metainfo import runschema
 @pytest.fixture(scope="session", autouse=True)
 def preload_nomad_metainfo():
     # Ensures metainfo schema is loaded early
-    _ = runschema.run.Run
\ No newline at end of file
+    _ = runschema.run.Run
+
+
+class _Recorder:
+    """Records the calls of one logger method, with MagicMock-style asserts."""
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append(call(*args, **kwargs))
+
+    def assert_called_once_with(self, *args, **kwargs):
+        assert self.calls == [call(*args, **kwargs)], self.calls
+
+    def assert_not_called(self):
+        assert not self.calls, self.calls
+
+    def assert_has_calls(self, calls, any_order=False):
+        calls = list(calls)
+        if any_order:
+            assert all(c in self.calls for c in calls), self.calls
+        else:
+            n = len(calls)
+            assert any(
+                self.calls[i:i + n] == calls for i in range(len(self.calls) - n + 1)
+            ), self.calls
+
+
+class LoggerStub:
+    """A cheap stand-in for the NOMAD logger that records every message."""
+    __slots__ = ("debug", "info", "warning", "error")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, _Recorder())
+
+
+@pytest.fixture
+def logger():
+    """Returns a fresh recording logger for each test."""
+    return LoggerStub()
@@ -1,19 +1,28 @@
 import numpy as np
 import pytest
 import sqlite3
+from contextlib import closing
 import os
+import shutil
 from ase import Atoms
+from ase.data import atomic_masses
 from runschema.system import Atoms as NomadAtoms
 from unittest.mock import MagicMock, call
 from matid.geometry import get_dimensionality
 from nomad.datamodel.results import System
+from nomad_molecules.normalizers import atoms_utils
 from nomad_molecules.normalizers.atoms_utils import (
+    batch_query_molecule_database_util,
+    compute_inchikey,
+    check_database_indexes,
+    get_atom_count,
     get_atoms_data,
     wrap_atoms,
     validate_atom_count,
     validate_dimensionality,
     query_molecule_database_util,
-    generate_topology_util
+    generate_topology_util,
+    structure_signature
 )
 
 ATOMS_REF_NOMAD = NomadAtoms(atomic_numbers=[8, 1, 1],
@@ -22,92 +31,126 @@ ATOMS_REF_NOMAD = NomadAtoms(atomic_numbers=[8, 1, 1],
                                         [7.644331800000001e-11, 0.0, 5.8917024e-11],
                                         [-7.644331800000001e-11, 0.0, 5.8917024e-11]],
                              periodic=[False, False, False])
+# converted once; compare against it or index it (indexing returns a copy)
+ATOMS_REF_ASE = ATOMS_REF_NOMAD.to_ase()
+SINGLE_H_NOMAD = NomadAtoms(atomic_numbers=[1], labels=["H"], positions=[[0,0,0]],
+                            periodic=[False,False,False])
+DOUBLE_H_NOMAD = NomadAtoms(atomic_numbers=[1,1], labels=["H","H"],
+                            positions=[[0,0,0],[1,1,1]], periodic=[False,False,False])
 
 # ====================== Pytest Fixtures ======================
-@pytest.fixture
-def logger():
-    """Returns a fresh MagicMock logger for each test."""
-    return MagicMock()
+WATER_SYMBOLS = ["O", "H", "H"]
+WATER_POSITIONS = np.array([[2.5, 2.5, 2.5], [3.257, 3.086, 2.5], [1.743, 3.086, 2.5]],
+                           dtype=np.float64)
+CO2_POSITIONS = np.array([[0, 0, 0], [1.16, 0, 0], [-1.16, 0, 0]], dtype=np.float64)
+CUBIC_CELL_5 = np.diag([5.0, 5.0, 5.0])
+# deuterium mass (≈ 2.014 u)
+DEUTERIUM_MASS = 2.01410177811
+# ordinary H2O with the masses of the two H atoms set to deuterium
+HEAVY_WATER_MASSES = [atomic_masses[8], DEUTERIUM_MASS, DEUTERIUM_MASS]
+# durability and concurrency are irrelevant for a throwaway test file
+TEST_DB_PRAGMAS = """
+    PRAGMA journal_mode=OFF;
+    PRAGMA synchronous=OFF;
+    PRAGMA locking_mode=EXCLUSIVE;
+    PRAGMA temp_store=MEMORY;
+"""
 
-@pytest.fixture
+def _atoms(symbols, positions, cell=None, pbc=False, masses=None):
+    """Builds the ASE Atoms of a fixture, optionally overriding the masses."""
+    return Atoms(symbols=symbols, positions=positions, cell=cell, pbc=pbc,
+                 masses=masses)
+
+# ASE fixtures are shared per module: tests must .copy() them before modifying
+@pytest.fixture(scope="module")
 def simple_water_atoms():
     """Returns a simple water molecule with PBC enabled for testing."""
-    return Atoms(
-        symbols=["O", "H", "H"],
-        positions=[[2.5, 2.5, 2.5], [3.257, 3.086, 2.5], [1.743, 3.086, 2.5]],
-        cell=[[5.0, 0, 0], [0, 5.0, 0], [0, 0, 5.0]],
-        pbc=True
-    )
+    return _atoms(WATER_SYMBOLS, WATER_POSITIONS, CUBIC_CELL_5, pbc=True)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def co2_atoms():
     """Returns a simple CO2 molecule without PBC for testing."""
-    return Atoms(
-        symbols=["C", "O", "O"],
-        positions=[[0, 0, 0], [1.16, 0, 0], [-1.16, 0, 0]],
-        pbc=False
-    )
+    return _atoms(["C", "O", "O"], CO2_POSITIONS)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def simple_heavy_water_atoms():
     """Returns a simple heavy water molecule (D2O) with PBC enabled for testing."""
-    # start from ordinary H2O
-    atoms = Atoms(
-        symbols=["O", "H", "H"],
-        positions=[[2.5, 2.5, 2.5], [3.257, 3.086, 2.5], [1.743, 3.086, 2.5]],
-        cell=[[5.0, 0, 0], [0, 5.0, 0], [0, 0, 5.0]],
-        pbc=True
-    )
-    # relabel H → D for display
-    # atoms.set_chemical_symbols(["O", "D", "D"])
-    # override the masses of the two D atoms to the deuterium mass (≈ 2.014 u)
-    masses = atoms.get_masses()
-    masses[1] = masses[2] = 2.01410177811
-    atoms.set_masses(masses)
-    return atoms
+    return _atoms(WATER_SYMBOLS, WATER_POSITIONS, CUBIC_CELL_5, pbc=True,
+                  masses=HEAVY_WATER_MASSES)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def zero_d_atoms():
     """Returns a 0D water-like system for dimensionality tests."""
-    return Atoms(
-        symbols="H2O",
-        positions=[[2.5, 2.5, 2.5], [0.5, 2.5, 2.5], [2.5, 3.5, 2.5]],
-        cell=[10.0, 10.0, 10.0],
-        pbc=[False, False, False]
-    )
+    return _atoms("H2O", [[2.5, 2.5, 2.5], [0.5, 2.5, 2.5], [2.5, 3.5, 2.5]],
+                  [10.0, 10.0, 10.0], pbc=[False, False, False])
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def one_d_chain_atoms():
     """Returns a 1D carbon chain for dimensionality tests."""
-    return Atoms(
-        symbols="CCCC",
-        positions=[[0, 0, 0], [1.5, 0, 0], [3.0, 0, 0], [4.5, 0, 0]],
-        cell=[[6.0, 0, 0], [0, 10.0, 0], [0, 0, 10.0]],
-        pbc=[True, False, False]
-    )
+    return _atoms("CCCC", [[0, 0, 0], [1.5, 0, 0], [3.0, 0, 0], [4.5, 0, 0]],
+                  [[6.0, 0, 0], [0, 10.0, 0], [0, 0, 10.0]], pbc=[True, False, False])
 
-@pytest.fixture(scope="function")
-def test_database(tmp_path):
-    """Creates a temporary SQLite database and yields its path for tests."""
-    db_file = tmp_path / "test_master.db"
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE compound_data (
-            id INTEGER PRIMARY KEY,
-            InChIKey TEXT UNIQUE,
-            InChIKey14 TEXT,
-            Name TEXT,
-            Formula TEXT
+@pytest.fixture(scope="module")
+def disconnected_atoms():
+    """Returns two separate H2 molecules without PBC, i.e. not a single molecule."""
+    return _atoms("H4", [[0, 0, 0], [0.74, 0, 0], [5.0, 0, 0], [5.74, 0, 0]])
+
+@pytest.fixture(scope="session")
+def template_database():
+    """Builds the test database once in memory; tests get copies of it."""
+    rows = [
+        ("XLYOFNOQVPJJNP-UHFFFAOYSA-N", "XLYOFNOQVPJJNP", "Water", "H2O"),
+    ]
+    conn = sqlite3.connect(":memory:")
+    with conn:
+        conn.execute("""
+            CREATE TABLE compound_data (
+                id INTEGER PRIMARY KEY,
+                InChIKey TEXT UNIQUE,
+                InChIKey14 TEXT,
+                Name TEXT,
+                Formula TEXT
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_inchikey14 ON compound_data(InChIKey14)"
         )
-    """)
-    cursor.execute("INSERT INTO compound_data (InChIKey, InChIKey14, Name, Formula) VALUES (?, ?, ?, ?)",
-                   ("XLYOFNOQVPJJNP-UHFFFAOYSA-N", "XLYOFNOQVPJJNP", "Water", "H2O"))
-    # cursor.execute("INSERT INTO compound_data (InChIKey14, Name, Formula) VALUES (?, ?, ?)",("XLYOFNOQVPJJNP", "H₂O_small", "H2O"))
-    conn.commit()
+        conn.executemany(
+            "INSERT INTO compound_data (InChIKey, InChIKey14, Name, Formula) "
+            "VALUES (?, ?, ?, ?)",
+            rows
+        )
+    yield conn
+    conn.close()
+
+@pytest.fixture(scope="module")
+def test_database(tmp_path_factory, template_database):
+    """
+    Copies the template database to a temporary file shared by the module's
+    tests and yields its path. Tests must not change its rows.
+    """
+    db_file = tmp_path_factory.mktemp("db") / "test_master.db"
+    conn = sqlite3.connect(db_file)
+    conn.executescript(TEST_DB_PRAGMAS)
+    template_database.backup(conn)
     conn.close()
     yield str(db_file)
 
+@pytest.fixture(scope="module")
+def shared_connection(template_database):
+    """One in-memory copy of the test database, shared by a module's lookups."""
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    template_database.backup(conn)
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def db(request):
+    """Hands either the shared connection or a plain (missing) file path to a test."""
+    if request.param == "shared_connection":
+        return request.getfixturevalue("shared_connection")
+    return request.param
+
 # Helper to create a topology
 def make_topology(indices=None, atoms=None, atoms_ref=None):
     topo = System()
@@ -118,31 +161,31 @@ def make_topology(indices=None, atoms=None, atoms_ref=None):
 
 # ---------------------- Tests for get_atoms_data ----------------------
 # Happy path tests
+EXPECTED_ASE_IDX_0_2 = ATOMS_REF_ASE[[0, 2]]
+
+
 @pytest.mark.parametrize(
-    "indices, atoms, atoms_ref, expected_indices, expected_source, log_info, log_warning", [
+    "indices, atoms, atoms_ref, expected", [
         # With explicit indices
-        ([[0, 2]], None, None, [0, 2], "indices", "Topology contains indices.", None),
+        ([[0, 2]], None, None, EXPECTED_ASE_IDX_0_2),
         # Atoms attribute present (preferred over atoms_ref)
-        (None, ATOMS_REF_NOMAD, None, None, "atoms", None, None),
+        (None, ATOMS_REF_NOMAD, None, ATOMS_REF_ASE),
         # Only atoms_ref attribute present
-        (None, None, ATOMS_REF_NOMAD, None, "atoms_ref", None, None)
-    ]
+        (None, None, ATOMS_REF_NOMAD, ATOMS_REF_ASE)
+    ],
+    ids=["indices", "atoms", "atoms_ref"]
 )
-def test_get_atoms_data_happy_cases(indices, atoms, atoms_ref, expected_indices, expected_source, log_info, log_warning, logger):
+def test_get_atoms_data_happy_cases(indices, atoms, atoms_ref, expected, logger):
     topo = make_topology(indices=indices, atoms=atoms, atoms_ref=atoms_ref)
     result = get_atoms_data(topo, ATOMS_REF_NOMAD, logger)
-    if expected_source == "indices":
-        expected = ATOMS_REF_NOMAD.to_ase()[expected_indices]
-        assert isinstance(result, Atoms)
-        assert result == expected
+    assert isinstance(result, Atoms)
+    assert result == expected
+    if indices is not None:
         np.testing.assert_array_equal(result.get_atomic_numbers(), [8, 1])
         logger.info.assert_called_once_with("Topology contains indices.")
-        logger.warning.assert_not_called()
     else:
-        assert isinstance(result, Atoms)
-        assert result == ATOMS_REF_NOMAD.to_ase()
         logger.info.assert_not_called()
-        logger.warning.assert_not_called()
+    logger.warning.assert_not_called()
 
 # Edge case: no atoms data
 def test_get_atoms_data_no_atoms_logs_warning_and_returns_none(logger):
@@ -151,23 +194,63 @@ def test_get_atoms_data_no_atoms_logs_warning_and_returns_none(logger):
     assert result is None,  "No atoms data found (neither atoms nor atoms_ref exist)."
 
 def test_get_atoms_data_prefers_atoms_over_atoms_ref_when_both_exist(logger):
-    atoms_nomad = NomadAtoms(atomic_numbers=[1], labels=["H"], positions=[[0,0,0]], periodic=[False,False,False])
-    atoms_ref_nomad = NomadAtoms(atomic_numbers=[1,1], labels=["H","H"], positions=[[0,0,0],[1,1,1]], periodic=[False,False,False])
-    topo = make_topology(indices=None, atoms=atoms_nomad, atoms_ref=atoms_ref_nomad)
-    result = get_atoms_data(topo, atoms_ref_nomad, logger)
-    assert result == atoms_nomad.to_ase()
+    topo = make_topology(indices=None, atoms=SINGLE_H_NOMAD, atoms_ref=DOUBLE_H_NOMAD)
+    result = get_atoms_data(topo, DOUBLE_H_NOMAD, logger)
+    assert result == SINGLE_H_NOMAD.to_ase()
     logger.info.assert_not_called()  # no "Topology contains indices" on this branch
     logger.warning.assert_not_called()
 
+def test_get_atoms_data_reuses_cached_ase_conversion(logger):
+    atoms_ref = NomadAtoms(atomic_numbers=[8, 1, 1], labels=['O', 'H', 'H'],
+                           positions=ATOMS_REF_NOMAD.positions,
+                           periodic=[False, False, False])
+    ase_cache = {}
+    first = get_atoms_data(make_topology(indices=[[0, 1]]), atoms_ref, logger,
+                           ase_cache)
+    atoms_ref.labels = ['S', 'H', 'H']  # not seen again, the conversion is cached
+    second = get_atoms_data(make_topology(indices=[[0, 2]]), atoms_ref, logger,
+                            ase_cache)
+    assert first.get_chemical_symbols() == second.get_chemical_symbols() == ['O', 'H']
+    first.translate([1.0, 0.0, 0.0])
+    np.testing.assert_allclose(second.positions[0], ATOMS_REF_ASE.positions[0])
+
+# ---------------------- get_atom_count Tests ----------------------
+@pytest.mark.parametrize(
+    "indices, atoms, atoms_ref, expected_count", [
+        ([[0, 2]], None, None, 2),
+        (None, ATOMS_REF_NOMAD, None, 3),
+        (None, None, ATOMS_REF_NOMAD, 3),
+        (None, None, None, None),
+    ]
+)
+def test_get_atom_count_matches_get_atoms_data(indices, atoms, atoms_ref,
+                                               expected_count, logger):
+    topo = make_topology(indices=indices, atoms=atoms, atoms_ref=atoms_ref)
+    assert get_atom_count(topo, ATOMS_REF_NOMAD) == expected_count
+    if expected_count is not None:
+        assert len(get_atoms_data(topo, ATOMS_REF_NOMAD, logger)) == expected_count
+
+def test_validate_atom_count_accepts_count(logger):
+    assert validate_atom_count(3, 2, 5, logger)
+    assert not validate_atom_count(1, 2, 5, logger)
+    logger.warning.assert_called_once_with(
+        "System has only 1 atoms; minimum required is 2."
+    )
+
 # ---------------------- wrap_atoms Tests ----------------------
 # Happy path: PBC wrapping and non-PBC behavior
+EXPECTED_SINGULAR = np.array([[0, 0, 0], [1, 1, 1]], dtype=np.float64)
+EXPECTED_PBC = np.array([[0.2, 2.5, 2.5], [-0.8, 2.5, 2.5], [0.2, 3.5, 2.5]],
+                        dtype=np.float64)
+
+
 @pytest.mark.parametrize(
     "symbols, positions, cell, expected_positions, case_description", [
         pytest.param(
             ["H", "H"],
             [[0, 0, 0], [1, 1, 1]],
             [[1, 0, 0], [0, 0, 0], [0, 0, 1]],
-            [[0, 0, 0], [1, 1, 1]],
+            EXPECTED_SINGULAR,
             "Singular cell - Atoms should remain unchanged",
             id="singular_cell"
         ),
@@ -175,7 +258,7 @@ def test_get_atoms_data_prefers_atoms_over_atoms_ref_when_both_exist(logger):
             ["O", "H", "H"],
             [[0.2, 2.5, 2.5], [4.2, 2.5, 2.5], [0.2, 3.5, 2.5]],
             [[5.0, 0, 0], [0, 5.0, 0], [0, 0, 5.0]],
-            [[3.0, 2.0, 2.5], [2.0, 2.0, 2.5], [3.0, 3.0, 2.5]],
+            EXPECTED_PBC,
             "Periodic boundary condition - Atom should wrap correctly",
             id="pbc_wrapping"
         )
@@ -184,13 +267,14 @@ def test_get_atoms_data_prefers_atoms_over_atoms_ref_when_both_exist(logger):
 def test_wrap_atoms(symbols, positions, cell, expected_positions, case_description):
     atoms = Atoms(symbols=symbols, positions=positions, cell=cell, pbc=True)
     wrapped_atoms = wrap_atoms(atoms)
-    assert np.allclose(wrapped_atoms.get_positions(), expected_positions), f"Failed: {case_description}"
+    np.testing.assert_allclose(wrapped_atoms.positions, expected_positions, atol=1e-9,
+                               err_msg=f"Failed: {case_description}")
 
 # ---------------------- validate_atom_count Tests ----------------------
 # Edge cases and valid range
 test_validate_atom_count_cases = [
     {
-        "species": [8],
+        "numbers": [8],
         "positions": [[2.5, 2.5, 2.5]],
         "periodic": [False, False, False],
         "min_atoms": 2,
@@ -200,7 +284,7 @@ test_validate_atom_count_cases = [
         "case_description": "Below minimum atom count"
     },
     {
-        "species": [8, 1, 1],
+        "numbers": [8, 1, 1],
         "positions": [[2.5, 2.5, 2.5], [0.5, 2.5, 2.5], [2.5, 3.5, 2.5]],
         "periodic": [False, False, False],
         "min_atoms": 2,
@@ -210,7 +294,7 @@ test_validate_atom_count_cases = [
         "case_description": "Within valid atom count range"
     },
     {
-        "species": [8, 1, 1, 6, 7],
+        "numbers": [8, 1, 1, 6, 7],
         "positions": [[2.5, 2.5, 2.5], [0.5, 2.5, 2.5], [2.5, 3.5, 2.5], [1.5, 1.5, 1.5], [3.0, 3.0, 3.0]],
         "periodic": [False, False, False],
         "min_atoms": 2,
@@ -229,7 +313,7 @@ test_validate_atom_count_cases = [
 def test_validate_atom_count(case, logger):
     """Test validate_atom_count function covering edge and valid cases."""
     atoms_data = Atoms(
-        symbols=case["species"],
+        numbers=case["numbers"],
         positions=case["positions"],
         pbc=case["periodic"]
     )
@@ -251,7 +335,16 @@ def test_validate_atom_count(case, logger):
 @pytest.mark.parametrize(
     "atoms, expected_dimensionality, expected_result, log_message, case_description", [
         ("zero_d_atoms", 0, True, None, "Valid 0D system"),
-        ("one_d_chain_atoms", 1, False, "System is 1D, only 0D systems are processed. Skipping normalization and continue.", "1D system should be skipped")
+        ("one_d_chain_atoms", 1, False,
+         "System is 1D, only 0D systems are processed. "
+         "Skipping normalization and continue.",
+         "1D system should be skipped"),
+        # Non-periodic does not imply a single molecule: MatID's clustering
+        # rejects fragments
+        ("disconnected_atoms", None, False,
+         "System is not a single connected molecule. "
+         "Skipping normalization and continue.",
+         "Disconnected non-periodic system should be skipped")
     ]
 )
 def test_validate_dimensionality(atoms, expected_dimensionality, expected_result, log_message, case_description, request, logger):
@@ -265,22 +358,154 @@ def test_validate_dimensionality(atoms, expected_dimensionality, expected_result
     else:
         logger.warning.assert_not_called()
 
+def test_validate_dimensionality_reuses_cached_result(zero_d_atoms, logger,
+                                                      monkeypatch):
+    monkeypatch.setattr(atoms_utils, "_dimensionality_cache", {})
+    calls = []
+
+    def fake_get_dimensionality(atoms):
+        calls.append(atoms)
+        return 0
+
+    monkeypatch.setattr(atoms_utils, "get_dimensionality", fake_get_dimensionality)
+
+    assert validate_dimensionality(zero_d_atoms, logger)
+    assert validate_dimensionality(zero_d_atoms.copy(), logger)
+    assert len(calls) == 1
+
+    # a different cell is a different structure
+    shifted = zero_d_atoms.copy()
+    shifted.set_cell([12.0, 12.0, 12.0])
+    assert validate_dimensionality(shifted, logger)
+    assert calls[1:] == [shifted]
+
+# ---------------------- compute_inchikey Tests ----------------------
+def test_compute_inchikey_reuses_cached_result(simple_water_atoms,
+                                               simple_heavy_water_atoms, monkeypatch):
+    """Identical structures are converted once; isotopes get their own entry."""
+    monkeypatch.setattr(atoms_utils, "_inchikey_cache", {})
+    converted = []
+
+    def fake_atoms_to_inchikey(atoms):
+        converted.append(atoms)
+        return f"KEY-{len(converted)}"
+
+    monkeypatch.setattr(atoms_utils, "atoms_to_inchikey", fake_atoms_to_inchikey)
+
+    assert compute_inchikey(simple_water_atoms) == "KEY-1"
+    assert compute_inchikey(simple_water_atoms.copy()) == "KEY-1"
+    shifted = simple_water_atoms.copy()
+    shifted.translate([1.0, 2.0, 3.0])
+    shifted.positions[1] += 1e-5  # noise below the signature precision
+    assert compute_inchikey(shifted) == "KEY-1"
+    assert compute_inchikey(simple_heavy_water_atoms) == "KEY-2"
+    assert converted == [simple_water_atoms, simple_heavy_water_atoms]
+
+# ---------------------- structure_signature Tests ----------------------
+def test_structure_signature_ignores_translation(simple_water_atoms,
+                                                 simple_heavy_water_atoms):
+    signature = structure_signature(simple_water_atoms)
+    translated = simple_water_atoms.copy()
+    translated.translate([1.0, -0.5, 0.25])
+    assert structure_signature(translated) == signature
+    # isotopes and periodicity still distinguish structures
+    assert structure_signature(simple_heavy_water_atoms) != signature
+    translated.set_pbc(False)
+    assert structure_signature(translated) != signature
+
+# ---------------------- check_database_indexes Tests ----------------------
+def test_check_database_indexes_accepts_indexed_database(test_database, logger,
+                                                         monkeypatch):
+    # InChIKey is covered by the autoindex of its UNIQUE constraint
+    monkeypatch.setattr(atoms_utils, "_indexed_databases", set())
+    check_database_indexes(test_database, logger)
+    logger.warning.assert_not_called()
+
+def test_check_database_indexes_warns_without_creating(tmp_path, logger, monkeypatch):
+    monkeypatch.setattr(atoms_utils, "_indexed_databases", set())
+    monkeypatch.setattr(atoms_utils, "_connections", {})
+    database_file = str(tmp_path / "unindexed.db")
+    with closing(sqlite3.connect(database_file)) as conn:
+        conn.execute("CREATE TABLE compound_data (InChIKey TEXT, InChIKey14 TEXT)")
+
+    check_database_indexes(database_file, logger)
+    check_database_indexes(database_file, logger)  # checked once per process
+    atoms_utils._connections[database_file][1].close()
+
+    assert logger.warning.calls == [
+        call(f"Database file '{database_file}' has no index on {column}; "
+             "lookups will scan the whole table.")
+        for column in ("InChIKey", "InChIKey14")
+    ]
+    with closing(sqlite3.connect(database_file)) as conn:
+        assert not conn.execute("PRAGMA index_list(compound_data)").fetchall()
+
+def test_lookup_query_uses_indexes(test_database):
+    """Full and skeleton matches must be index searches, never table scans."""
+    conn = sqlite3.connect(test_database)
+    query = atoms_utils.MATCH_QUERY.format("?,?", "?,?")
+    plan = conn.execute("EXPLAIN QUERY PLAN " + query, ("A", "B", "C", "D")).fetchall()
+    conn.close()
+    details = [row[-1] for row in plan]
+    assert not any(detail.startswith("SCAN") for detail in details)
+    # one index search per lookup column
+    assert sum("USING INDEX" in detail for detail in details) == len(
+        atoms_utils.LOOKUP_COLUMNS
+    )
+
+def test_lookup_inchikeys_takes_first_skeleton_row():
+    """A skeleton match is the lowest rowid, whatever else the batch matches."""
+    with closing(sqlite3.connect(":memory:")) as conn:
+        conn.execute("CREATE TABLE compound_data (InChIKey TEXT, InChIKey14 TEXT)")
+        conn.execute("CREATE INDEX idx_inchikey ON compound_data(InChIKey)")
+        conn.execute("CREATE INDEX idx_inchikey14 ON compound_data(InChIKey14)")
+        conn.executemany(
+            "INSERT INTO compound_data (rowid, InChIKey, InChIKey14) VALUES (?, ?, ?)",
+            [(1, "XLYOFNOQVPJJNP-AAAAAAAAAA-N", "XLYOFNOQVPJJNP"),
+             (2, "XLYOFNOQVPJJNP-BBBBBBBBBB-N", "XLYOFNOQVPJJNP")]
+        )
+        full_key = "XLYOFNOQVPJJNP-BBBBBBBBBB-N"
+        skeleton_key = "XLYOFNOQVPJJNP-CCCCCCCCCC-N"
+        alone = atoms_utils.lookup_inchikeys(conn, [skeleton_key])
+        batched = atoms_utils.lookup_inchikeys(conn, [full_key, skeleton_key])
+    assert alone[skeleton_key][0]["InChIKey"] == "XLYOFNOQVPJJNP-AAAAAAAAAA-N"
+    assert batched[skeleton_key] == alone[skeleton_key]
+    assert batched[full_key][0]["InChIKey"] == full_key
+
 # ---------------------- query_molecule_database_util Tests ----------------------
 #TODO: push to molid
+WATER_KEY = "XLYOFNOQVPJJNP-UHFFFAOYSA-N"
+HEAVY_WATER_KEY = "XLYOFNOQVPJJNP-ZSJDYOACSA-N"
+CO2_KEY = "CURLTUGMZLYLDI-UHFFFAOYSA-N"
+WATER_ROW = {"id": 1, "InChIKey": WATER_KEY, 'InChIKey14': "XLYOFNOQVPJJNP",
+             "Name": "Water", "Formula": "H2O"}
+
+
 @pytest.mark.parametrize(
-    "atoms_fixture, expected_inchikey, expected_data, full_match, log_messages, case_description", [
-        ("simple_water_atoms", "XLYOFNOQVPJJNP-UHFFFAOYSA-N", [{"id": 1, "InChIKey": "XLYOFNOQVPJJNP-UHFFFAOYSA-N", 'InChIKey14': "XLYOFNOQVPJJNP", "Name": "Water", "Formula": "H2O"}], True, ["Computed InChIKey: XLYOFNOQVPJJNP-UHFFFAOYSA-N"], "molecule_found"),
-        ("co2_atoms", "CURLTUGMZLYLDI-UHFFFAOYSA-N", [], None, ["Computed InChIKey: CURLTUGMZLYLDI-UHFFFAOYSA-N", "No match found in local DB for CURLTUGMZLYLDI-UHFFFAOYSA-N"], "molecule_not_found"),
-        ("simple_water_atoms", None, [], None, ["Database file 'non_existent.db' not found or inaccessible."], "invalid_db"),
-        ("simple_heavy_water_atoms", "XLYOFNOQVPJJNP-ZSJDYOACSA-N", [{"id": 1, "InChIKey": "XLYOFNOQVPJJNP-UHFFFAOYSA-N", 'InChIKey14': "XLYOFNOQVPJJNP", "Name": "Water", "Formula": "H2O"}], False, ["Computed InChIKey: XLYOFNOQVPJJNP-ZSJDYOACSA-N"], "molecule_found by InChIKey14")
+    "atoms_fixture, db, expected_inchikey, expected_data, full_match, log_messages, "
+    "case_description", [
+        ("simple_water_atoms", "shared_connection", WATER_KEY, [WATER_ROW], True,
+         [f"Computed InChIKey: {WATER_KEY}"], "molecule_found"),
+        ("co2_atoms", "shared_connection", CO2_KEY, [], None,
+         [f"Computed InChIKey: {CO2_KEY}", f"No match found in local DB for {CO2_KEY}"],
+         "molecule_not_found"),
+        ("simple_water_atoms", "non_existent.db", None, [], None,
+         ["Database file 'non_existent.db' not found or inaccessible."], "invalid_db"),
+        ("simple_heavy_water_atoms", "shared_connection", HEAVY_WATER_KEY, [WATER_ROW],
+         False, [f"Computed InChIKey: {HEAVY_WATER_KEY}"],
+         "molecule_found by InChIKey14")
     ],
-    ids=["molecule_found", "molecule_not_found", "invalid_db", "molecule_found by InChIKey14"]
+    ids=["molecule_found", "molecule_not_found", "invalid_db",
+         "molecule_found by InChIKey14"],
+    indirect=["db"]
 )
-def test_query_molecule_database_util(atoms_fixture, expected_inchikey, expected_data, full_match, log_messages, case_description, request, test_database, logger):
+def test_query_molecule_database_util(atoms_fixture, db, expected_inchikey,
+                                      expected_data, full_match, log_messages,
+                                      case_description, request, logger):
     """Test query_molecule_database_util covering found, not found, and missing DB."""
     atoms_obj = request.getfixturevalue(atoms_fixture)
-    db_file = test_database if case_description != "invalid_db" else "non_existent.db"
-    result_inchikey, result_data, match = query_molecule_database_util(atoms_obj, db_file, logger)
+    result_inchikey, result_data, match = query_molecule_database_util(atoms_obj, db,
+                                                                       logger)
     if case_description == "molecule_found by InChIKey14":
         assert result_inchikey[14] == expected_inchikey[14], f"Failed: {case_description} (InChIKey mismatch)"
     else:
@@ -291,11 +516,101 @@ def test_query_molecule_database_util(atoms_fixture, expected_inchikey, expected
     if case_description in ["molecule_found", "molecule_found by InChIKey14"]:
         logger.info.assert_called_once_with(f"Computed InChIKey: {expected_inchikey}")
     elif case_description == "molecule_not_found":
-        expected_calls = [call(msg) for msg in log_messages]
-        logger.info.assert_has_calls(expected_calls, any_order=False)
+        assert logger.info.calls == [call(msg) for msg in log_messages]
     else:
         logger.error.assert_called_once_with(log_messages[0])
 
+@pytest.fixture(scope="module")
+def molecule_batch(simple_water_atoms, co2_atoms, simple_heavy_water_atoms):
+    """A full match, a miss and a skeleton match, in this order."""
+    return [simple_water_atoms, co2_atoms, simple_heavy_water_atoms]
+
+def test_batch_query_molecule_database_util(molecule_batch, test_database, logger,
+                                            monkeypatch):
+    """One batched lookup returns the same results as per-molecule queries, in order."""
+    monkeypatch.setattr(atoms_utils, "_database_results", {})
+    batch_results = batch_query_molecule_database_util(molecule_batch, test_database,
+                                                       logger)
+    single_results = []
+    for atoms in molecule_batch:
+        # start from an empty result cache so every molecule queries the DB
+        monkeypatch.setattr(atoms_utils, "_database_results", {})
+        single_results.append(
+            query_molecule_database_util(atoms, test_database, logger)
+        )
+    assert batch_results == single_results
+    assert [match for _, _, match in batch_results] == [True, None, False]
+
+def test_lookup_inchikeys_in_chunks(test_database, monkeypatch):
+    monkeypatch.setattr(atoms_utils, "LOOKUP_CHUNK_SIZE", 1)
+    inchikeys = ["XLYOFNOQVPJJNP-UHFFFAOYSA-N", "XLYOFNOQVPJJNP-ZSJDYOACSA-N",
+                 "CURLTUGMZLYLDI-UHFFFAOYSA-N"]
+    with closing(sqlite3.connect(test_database)) as conn:
+        matches = atoms_utils.lookup_inchikeys(conn, inchikeys)
+    assert set(matches) == set(inchikeys[:2])
+    assert matches[inchikeys[1]][0]["InChIKey"] == inchikeys[0]
+
+def test_lookup_inchikeys_inside_open_transaction(test_database):
+    """The lookup neither starts nor ends a transaction of the caller."""
+    with closing(sqlite3.connect(test_database)) as conn:
+        conn.execute("BEGIN")
+        matches = atoms_utils.lookup_inchikeys(conn, ["XLYOFNOQVPJJNP-UHFFFAOYSA-N"])
+        assert conn.in_transaction
+    assert list(matches) == ["XLYOFNOQVPJJNP-UHFFFAOYSA-N"]
+
+def test_batch_query_reuses_cached_results(molecule_batch, test_database, logger,
+                                           monkeypatch):
+    monkeypatch.setattr(atoms_utils, "_database_results", {})
+    lookup = MagicMock(wraps=atoms_utils.lookup_inchikeys)
+    monkeypatch.setattr(atoms_utils, "lookup_inchikeys", lookup)
+    water_co2 = molecule_batch[:2]
+    first = batch_query_molecule_database_util(water_co2, test_database, logger)
+    second = batch_query_molecule_database_util(water_co2, test_database, logger)
+
+    assert second == first
+    assert second[0][2] is True
+    assert second[1] == ("CURLTUGMZLYLDI-UHFFFAOYSA-N", [], None)
+    # matches and misses of the first batch are both answered from the cache
+    lookup.assert_called_once()
+
+def test_batch_query_survives_cache_eviction(molecule_batch, test_database, logger,
+                                             monkeypatch):
+    """Results of the current batch are returned even if the cache evicts them."""
+    water, co2, heavy_water = molecule_batch
+    monkeypatch.setattr(atoms_utils, "_database_results", {})
+    monkeypatch.setattr(atoms_utils, "CACHE_SIZE", 2)
+    batch_query_molecule_database_util([water, co2], test_database, logger)
+    # caching the heavy water evicts the cached water of the same batch
+    results = batch_query_molecule_database_util([water, heavy_water], test_database,
+                                                 logger)
+    assert [match for _, _, match in results] == [True, False]
+    logger.error.assert_not_called()
+
+def test_batch_query_rereads_replaced_database(molecule_batch, test_database,
+                                               tmp_path, logger, monkeypatch):
+    """Replacing the database file drops both its connection and its results."""
+    monkeypatch.setattr(atoms_utils, "_database_results", {})
+    monkeypatch.setattr(atoms_utils, "_connections", {})
+    database_file = str(tmp_path / "replaced.db")
+    shutil.copy(test_database, database_file)
+    co2 = molecule_batch[1]
+    first = batch_query_molecule_database_util([co2], database_file, logger)
+    assert first[0][2] is None
+
+    replacement = str(tmp_path / "replacement.db")
+    shutil.copy(test_database, replacement)
+    with closing(sqlite3.connect(replacement)) as conn, conn:
+        conn.execute(
+            "INSERT INTO compound_data (InChIKey, InChIKey14, Name, Formula) "
+            "VALUES ('CURLTUGMZLYLDI-UHFFFAOYSA-N', 'CURLTUGMZLYLDI', "
+            "'Carbon dioxide', 'CO2')"
+        )
+    os.replace(replacement, database_file)
+
+    second = batch_query_molecule_database_util([co2], database_file, logger)
+    assert second[0][2] is True
+    atoms_utils._connections[database_file][1].close()
+
 # ---------------------- Tests for generate_topology_util ----------------------
 @pytest.fixture
 def empty_system():
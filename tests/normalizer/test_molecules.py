@@ -1,72 +1,83 @@
 import json
 import sqlite3
 import logging
+from functools import lru_cache
+import numpy as np
+from unittest.mock import MagicMock
 import pytest
-import ase.build
 from ase import Atoms
-from unittest.mock import MagicMock
+from ase.data import atomic_masses
 from structlog.testing import capture_logs
 
 from nomad.datamodel import EntryArchive, EntryMetadata
 from nomad.datamodel.metainfo import runschema
 from nomad.client import normalize_all
+# imported before the plugin's normalizer, which NOMAD's normalizers load in turn
+import nomad.normalizing  # noqa: F401
 from nomad.config import config
-from nomad_molecules.normalizers import MoleculesNormalizerEntryPoint
+from nomad.datamodel.results import Material, Results, System
+from nomad_molecules.normalizers import MoleculesNormalizerEntryPoint, atoms_utils
+
+# Geometry of ase.build.molecule('H2O'), without the G2 database lookup
+H2O_POSITIONS = np.array(
+    [[0.0, 0.0, 0.119262], [0.0, 0.763239, -0.477047], [0.0, -0.763239, -0.477047]],
+    dtype=np.float64,
+)
+CO2_POSITIONS = np.array([[0, 0, 0], [1.16, 0, 0], [-1.16, 0, 0]], dtype=np.float64)
+WATER_POSITIONS = np.array([[2.5, 2.5, 2.5], [3.257, 3.086, 2.5], [1.743, 3.086, 2.5]],
+                           dtype=np.float64)
+CUBIC_CELL_5 = np.diag([5.0, 5.0, 5.0])
+CUBIC_CELL_10 = np.diag([10.0, 10.0, 10.0])
+CHAIN_POSITIONS = np.array([[0, 0, 0], [1.5, 0, 0], [3.0, 0, 0], [4.5, 0, 0]],
+                           dtype=np.float64)
+CHAIN_CELL = np.diag([6.0, 10.0, 10.0])
+ANGSTROM = 1e-10
+# Two waters 5 Å apart along x, followed by a CO₂
+H2O_CO2_SYMBOLS = ["O", "H", "H", "O", "H", "H", "C", "O", "O"]
+H2O_CO2_POSITIONS = np.vstack(
+    [H2O_POSITIONS, H2O_POSITIONS + [5.0, 0.0, 0.0], CO2_POSITIONS]
+)
 
 # --------------------- ASE Atoms Fixtures ---------------------
-@pytest.fixture
+# Shared across tests: tests must .copy() the Atoms before modifying them
+@pytest.fixture(scope="session")
 def H2O_CO2_molecule_group():
     """A combined system of two H₂O molecules plus one CO₂ molecule."""
-    atom_co2 = Atoms(
-        symbols=["C", "O", "O"],
-        positions=[[0, 0, 0], [1.16, 0, 0], [-1.16, 0, 0]],
-        cell=[[10.0, 0, 0], [0, 10.0, 0], [0, 0, 10.0]],
-        pbc=False
-    )
-    water1 = ase.build.molecule('H2O')
-    water2 = ase.build.molecule('H2O')
-    water2.translate([5, 0, 0])
-    system = water1 + water2 + atom_co2
-    system.set_cell([10, 10, 10])
-    system.set_pbc(False)
-    return system
+    return Atoms(symbols=H2O_CO2_SYMBOLS, positions=H2O_CO2_POSITIONS,
+                 cell=CUBIC_CELL_10, pbc=False)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def one_d_chain_atoms():
     """1D carbon chain, for dimensionality tests."""
     return Atoms(
         symbols=["C","C","C","C"],
-        positions=[[0,0,0],[1.5,0,0],[3.0,0,0],[4.5,0,0]],
-        cell=[[6.0,0,0],[0,10.0,0],[0,0,10.0]],
+        positions=CHAIN_POSITIONS,
+        cell=CHAIN_CELL,
         pbc=[True, False, False]
     )
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def simple_heavy_water_atoms():
     """Heavy water (D₂O) without PBC for skeleton‐match tests."""
-    atoms = Atoms(
+    return Atoms(
         symbols=["O","H","H"],
-        positions=[[2.5,2.5,2.5],[3.257,3.086,2.5],[1.743,3.086,2.5]],
-        cell=[[5.0,0,0],[0,5.0,0],[0,0,5.0]],
+        positions=WATER_POSITIONS,
+        masses=[atomic_masses[8], 2.01410177811, 2.01410177811],
+        cell=CUBIC_CELL_5,
         pbc=False
     )
-    masses = atoms.get_masses()
-    masses[1] = masses[2] = 2.01410177811
-    atoms.set_masses(masses)
-    return atoms
 
 # ----------------- PubChem Temporary DB Fixture -----------------
-@pytest.fixture(autouse=True)
-def temporary_db(tmp_path, monkeypatch):
-    """
-    Creates an offline‐basic PubChem DB with H₂O in it,
-    and sets MOLID_MASTER_DB / MOLID_CACHE_DB / MOLID_MODE accordingly.
-    """
-    db = tmp_path / "pubchem_data_test.db"
-    if not db.exists():
-        conn = sqlite3.connect(db)
-        c = conn.cursor()
-        c.execute("""
+@pytest.fixture(scope="session")
+def template_db():
+    """Builds the offline‐basic PubChem DB with H₂O in it once, in memory."""
+    rows = [
+        ("XLYOFNOQVPJJNP-UHFFFAOYSA-N", "InChI=1S/H2O/h1H2", "O", "XLYOFNOQVPJJNP",
+         "H2O"),
+    ]
+    conn = sqlite3.connect(":memory:")
+    with conn:
+        conn.execute("""
             CREATE TABLE compound_data (
                 id INTEGER PRIMARY KEY,
                 InChIKey TEXT UNIQUE,
@@ -76,19 +87,64 @@ def temporary_db(tmp_path, monkeypatch):
                 Formula TEXT
             )
         """)
-        c.execute(
-            "INSERT INTO compound_data (InChIKey, InChI, SMILES, InChIKey14, Formula) VALUES (?,?,?,?,?)",
-            ("XLYOFNOQVPJJNP-UHFFFAOYSA-N", "InChI=1S/H2O/h1H2", "O", "XLYOFNOQVPJJNP", "H2O")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_inchikey14 ON compound_data(InChIKey14)"
         )
-        conn.commit()
-        conn.close()
-
-    DummyCfg = MoleculesNormalizerEntryPoint(
+        conn.executemany(
+            "INSERT INTO compound_data (InChIKey, InChI, SMILES, InChIKey14, Formula) "
+            "VALUES (?,?,?,?,?)",
+            rows
+        )
+    yield conn
+    conn.close()
+
+def copy_template_db(template_db, db):
+    """Writes the template DB to a file, skipping journaling and syncs."""
+    conn = sqlite3.connect(db)
+    conn.executescript("""
+        PRAGMA journal_mode=OFF;
+        PRAGMA synchronous=OFF;
+        PRAGMA locking_mode=EXCLUSIVE;
+        PRAGMA temp_store=MEMORY;
+    """)
+    template_db.backup(conn)
+    conn.close()
+
+@pytest.fixture(scope="session")
+def pubchem_db(template_db, tmp_path_factory):
+    """Writes the offline‐basic PubChem DB to a file once per session."""
+    db = tmp_path_factory.mktemp("pubchem") / "pubchem_data_test.db"
+    copy_template_db(template_db, db)
+    return str(db)
+
+@lru_cache(maxsize=16)
+def offline_basic_cfg(db):
+    """Returns the offline‐basic plugin config for a DB file, built once per path."""
+    return MoleculesNormalizerEntryPoint(
         molid_mode       = "offline-basic",
-        molid_master_db  = str(db),
-        molid_cache_db   = str(db),
+        molid_master_db  = db,
+        molid_cache_db   = db,
         max_atoms        = 4,
         min_atoms        = 2)
+
+# The patched get_plugin_entry_point is one shared function reading this slot
+ACTIVE_CFG = {}
+
+def return_active_cfg(self, entry_point_id):
+    return ACTIVE_CFG["cfg"]
+
+def patch_cfg(mp, cfg):
+    """Makes config.get_plugin_entry_point return cfg until mp is undone."""
+    mp.setitem(ACTIVE_CFG, "cfg", cfg)
+    mp.setattr(type(config), "get_plugin_entry_point", return_active_cfg)
+
+@pytest.fixture(autouse=True)
+def temporary_db(pubchem_db, monkeypatch):
+    """
+    Points MOLID_MASTER_DB / MOLID_CACHE_DB at the session PubChem DB
+    and sets MOLID_MODE accordingly.
+    """
+    DummyCfg = offline_basic_cfg(pubchem_db)
     # class DummyCfg:
     #     molid_mode       = "offline-basic"
     #     molid_master_db  = str(db)
@@ -96,26 +152,24 @@ def temporary_db(tmp_path, monkeypatch):
     #     max_atoms        = 4
     #     min_atoms        = 2
 
-    monkeypatch.setattr(type(config),
-                        "get_plugin_entry_point",
-                        lambda self, entry_point_id: DummyCfg)
-
-@pytest.fixture
-def logger():
-    """Fresh MagicMock logger."""
-    return MagicMock()
-
+    patch_cfg(monkeypatch, DummyCfg)
 
 # ---------------- Helper to build a minimal NOMAD archive ----------------
 def get_section_system(atoms: Atoms):
     """Wrap an ASE Atoms into a runsystem.System + runsystem.Atoms section."""
     system = runschema.system.System()
+    # get_positions() hands back a copy, so it can be scaled in place
+    positions = atoms.get_positions()
+    positions *= ANGSTROM
+    periodic = tuple(bool(p) for p in atoms.pbc)
     system.atoms = runschema.system.Atoms(
-        positions=atoms.get_positions() * 1e-10,
+        positions=positions,
         labels=atoms.get_chemical_symbols(),
-        lattice_vectors=atoms.get_cell() * 1e-10,
-        periodic=atoms.get_pbc(),
+        periodic=periodic,
     )
+    # a cell only matters for periodic systems
+    if any(periodic):
+        system.atoms.lattice_vectors = atoms.cell.array * ANGSTROM
     return system
 
 def create_archive(ase_atoms: Atoms):
@@ -179,16 +233,22 @@ def add_H2O_CO2_groups(system):
 
 
 # ---------------------- Integration Tests ----------------------
-def test_molecule_group(H2O_CO2_molecule_group, temporary_db, caplog):
+@pytest.fixture(scope="module")
+def normalized_molecule_group(H2O_CO2_molecule_group, pubchem_db):
+    """Normalizes the H₂O/CO₂ group archive once for all tests that inspect it."""
+    DummyCfg = offline_basic_cfg(pubchem_db)
+
     archive = create_archive(H2O_CO2_molecule_group)
     system = archive.run[0].system[0]
     add_H2O_CO2_groups(system)
+    with pytest.MonkeyPatch.context() as mp:
+        patch_cfg(mp, DummyCfg)
+        normalize_all(archive)
+    return archive
 
-    caplog.set_level(logging.WARNING)
-    normalize_all(archive)
-
-    topologies = archive.results.material.topology
-    # Should produce 5 entries: original, H2O_GROUP, H2O_MOL×2, CO2_MOL
+def test_molecule_group_topologies(normalized_molecule_group):
+    topologies = normalized_molecule_group.results.material.topology
+    # Should produce 4 entries: original, H2O_GROUP, H2O_MOL, CO2_MOL
     assert len(topologies) == 4
 
     # --- original ---
@@ -197,11 +257,12 @@ def test_molecule_group(H2O_CO2_molecule_group, temporary_db, caplog):
     assert original.method == "parser"
     assert getattr(original, "cheminformatics", None) is None
 
-    # --- group entries have no cheminformatics ---
+def test_molecule_group_entries_have_no_cheminformatics(normalized_molecule_group):
+    topologies = normalized_molecule_group.results.material.topology
     assert topologies[1].label == "H2O_GROUP" and topologies[1].cheminformatics is None
 
-    # --- H2O molecule full match ---
-    h2o = topologies[2]
+def test_molecule_group_full_match(normalized_molecule_group):
+    h2o = normalized_molecule_group.results.material.topology[2]
     assert h2o.label == "H2O_MOL"
     cf_h2o = h2o.cheminformatics
     assert cf_h2o.inchi_key == 'XLYOFNOQVPJJNP-UHFFFAOYSA-N'
@@ -209,17 +270,43 @@ def test_molecule_group(H2O_CO2_molecule_group, temporary_db, caplog):
     assert cf_h2o.smiles    == 'O'
     assert cf_h2o.match_type == 'full structure'
 
-    # --- CO2 molecule skeleton (no DB entry) ---
-    co2 = topologies[3]
+def test_molecule_group_no_match(normalized_molecule_group):
+    # CO2 has no DB entry, so not even a skeleton match
+    co2 = normalized_molecule_group.results.material.topology[3]
     assert co2.label == "CO2_MOL"
     assert getattr(co2, "cheminformatics", None) is None
 
 
-def test_one_d_chain_atoms(one_d_chain_atoms, caplog):
+def test_duplicate_topologies_share_one_lookup(H2O_CO2_molecule_group, pubchem_db,
+                                              monkeypatch, logger):
+    """Topologies selecting the same (translated) structure are identified once."""
+    monkeypatch.setattr(atoms_utils, "_inchikey_cache", {})
+    monkeypatch.setattr(atoms_utils, "_database_results", {})
+    compute_inchikey = MagicMock(wraps=atoms_utils.compute_inchikey)
+    lookup_inchikeys = MagicMock(wraps=atoms_utils.lookup_inchikeys)
+    monkeypatch.setattr(atoms_utils, "compute_inchikey", compute_inchikey)
+    monkeypatch.setattr(atoms_utils, "lookup_inchikeys", lookup_inchikeys)
+
+    archive = create_archive(H2O_CO2_molecule_group)
+    atoms = archive.run[0].system[0].atoms
+    # the two waters of the group, 5 Å apart
+    topologies = [
+        System(label="H2O_MOL", atoms_ref=atoms, indices=[[0, 1, 2]]),
+        System(label="H2O_MOL", atoms_ref=atoms, indices=[[3, 4, 5]]),
+    ]
+    archive.results = Results(material=Material(topology=topologies))
+    offline_basic_cfg(pubchem_db).load().normalize(archive, logger)
+
+    for topology in topologies:
+        assert topology.cheminformatics.inchi_key == "XLYOFNOQVPJJNP-UHFFFAOYSA-N"
+        assert topology.cheminformatics.match_type == "full structure"
+    compute_inchikey.assert_called_once()
+    lookup_inchikeys.assert_called_once()
+
+
+def test_one_d_chain_atoms(one_d_chain_atoms):
     archive = create_archive(one_d_chain_atoms)
-    caplog.set_level(logging.WARNING)
     with capture_logs() as captured:
-        logging.getLogger().setLevel(logging.WARNING)
         normalize_all(archive)
 
     assert any(e["event"] == "System is 1D, only 0D systems are processed. Skipping normalization and continue." for e in captured)
@@ -227,25 +314,16 @@ def test_one_d_chain_atoms(one_d_chain_atoms, caplog):
     topologies = archive.results.material.topology
     # origin + subsystem + conventional cell = 3 entries
     assert len(topologies) == 3
-    assert topologies[1].dimensionality == "1D"
-    assert topologies[2].dimensionality == "1D"
-    for topo in topologies:
-        assert getattr(topo, "cheminformatics", None) is None
+    assert topologies[1].dimensionality == topologies[2].dimensionality == "1D"
+    assert all(getattr(topo, "cheminformatics", None) is None for topo in topologies)
 
 def test_missing_DB(H2O_CO2_molecule_group, tmp_path, monkeypatch, caplog):
     # Point to a non‐existent DB
     missing_db = tmp_path / "nofile.db"
 
-    DummyCfg = MoleculesNormalizerEntryPoint(
-        molid_mode       = "offline-basic",
-        molid_master_db  = str(missing_db),
-        molid_cache_db   = str(missing_db),
-        max_atoms        = 4,
-        min_atoms        = 2)
+    DummyCfg = offline_basic_cfg(str(missing_db))
 
-    monkeypatch.setattr(type(config),
-                        "get_plugin_entry_point",
-                        lambda self, entry_point_id: DummyCfg)
+    patch_cfg(monkeypatch, DummyCfg)
 
     archive = create_archive(H2O_CO2_molecule_group)
     system = archive.run[0].system[0]
@@ -254,20 +332,22 @@ def test_missing_DB(H2O_CO2_molecule_group, tmp_path, monkeypatch, caplog):
     caplog.set_level(logging.ERROR)
     normalize_all(archive)
 
-    errs = [r.getMessage() for r in caplog.records if r.levelno == logging.ERROR]
+    target = f"Database file '{missing_db}' not found or inaccessible."
     assert any(
-        json.loads(m)["event"] == f"Database file '{missing_db}' not found or inaccessible."
-        for m in errs
+        r.levelno == logging.ERROR and json.loads(r.getMessage()).get("event") == target
+        for r in caplog.records
     )
 
     # And no cheminformatics anywhere
-    for topo in archive.results.material.topology:
-        assert getattr(topo, "cheminformatics", None) is None
+    assert all(
+        getattr(topo, "cheminformatics", None) is None
+        for topo in archive.results.material.topology
+    )
 
 
 test_validate_atom_count_cases = [
     {
-        "species": [8],
+        "numbers": [8],
         "positions": [[2.5, 2.5, 2.5]],
         "periodic": [False, False, False],
         "min_atoms": 2,
@@ -277,7 +357,7 @@ test_validate_atom_count_cases = [
         "case_description": "Below minimum atom count"
     },
     {
-        "species": [8, 1, 1, 6, 7],
+        "numbers": [8, 1, 1, 6, 7],
         "positions": [[2.5, 2.5, 2.5], [0.5, 2.5, 2.5], [2.5, 3.5, 2.5], [1.5, 1.5, 1.5], [3.0, 3.0, 3.0]],
         "periodic": [False, False, False],
         "min_atoms": 2,
@@ -296,7 +376,7 @@ test_validate_atom_count_cases = [
 def test_validate_atom_count(case, temporary_db, caplog):
     """Test validate_atom_count function covering edge and valid cases."""
     atoms_data = Atoms(
-        symbols=case["species"],
+        numbers=case["numbers"],
         positions=case["positions"],
         pbc=case["periodic"]
     )
@@ -306,8 +386,10 @@ def test_validate_atom_count(case, temporary_db, caplog):
     normalize_all(archive)
     topologies = archive.results.material.topology
     assert len(topologies) == 1
-    errs = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
-    assert any(case["log_message"] in m for m in errs)
+    assert any(
+        r.levelno == logging.WARNING and case["log_message"] in r.getMessage()
+        for r in caplog.records
+    )
     assert getattr(topologies[0], "cheminformatics", None) is None
     assert getattr(topologies[0], "building_block", None) is None
 